@@ -1,11 +1,9 @@
-import torch
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer
-from scipy.spatial.distance import cosine
-from openai import OpenAI
 import logging
 import os
 import json
+import re
+import hashlib
+import threading
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -13,21 +11,32 @@ logger = logging.getLogger(__name__)
 _sentiment_analyzer = None
 _embedding_model = None
 _openai_client = None
+_model_lock = threading.Lock()
+_warmup_status = "not_started"
+
+# torch, transformers, sentence_transformers, scipy, numpy and openai are imported
+# inside the functions that need them so importing this module stays cheap.
 
 def get_sentiment_analyzer():
     global _sentiment_analyzer
     if _sentiment_analyzer is None:
-        logger.info("Loading sentiment analysis")
-        _sentiment_analyzer = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
-        logger.info("Sentiment model loaded.")
+        with _model_lock:
+            if _sentiment_analyzer is None:
+                from transformers import pipeline
+                logger.info("Loading sentiment analysis")
+                _sentiment_analyzer = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
+                logger.info("Sentiment model loaded.")
     return _sentiment_analyzer
 
 def get_embedding_model():
     global _embedding_model
     if _embedding_model is None:
-        logger.info("Loading sentence embedding model...")
-        _embedding_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-        logger.info("Embedding model loaded.")
+        with _model_lock:
+            if _embedding_model is None:
+                from sentence_transformers import SentenceTransformer
+                logger.info("Loading sentence embedding model...")
+                _embedding_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+                logger.info("Embedding model loaded.")
     return _embedding_model
     
 def get_openai_client():
@@ -35,9 +44,30 @@ def get_openai_client():
     if _openai_client is None:
         api_key = os.getenv("OPENAI_API_KEY")
         if api_key:
+            from openai import OpenAI
             _openai_client = OpenAI(api_key=api_key)
     return _openai_client
 
+def warmup_models() -> None:
+    global _warmup_status
+    _warmup_status = "loading"
+    try:
+        get_sentiment_analyzer()
+        get_embedding_model()
+        get_openai_client()
+        _warmup_status = "ready"
+        logger.info("Model warmup finished.")
+    except Exception as e:
+        _warmup_status = "failed"
+        logger.error(f"Model warmup failed: {e}", exc_info=True)
+
+def get_model_status() -> dict:
+    return {
+        "warmup": _warmup_status,
+        "sentiment_model_loaded": _sentiment_analyzer is not None,
+        "embedding_model_loaded": _embedding_model is not None,
+    }
+
 
 def analyze_sentiment(text: str) -> float:
     try:
@@ -62,8 +92,105 @@ def calculate_talk_ratio(transcript: str) -> float:
     total_words = agent_words + customer_words
     return agent_words / total_words if total_words > 0 else 0.0
 
+MINHASH_PERMUTATIONS = 128
+MINHASH_BANDS = 16
+SHINGLE_SIZE = 5
+_MERSENNE_PRIME = (1 << 31) - 1
+
+def _stable_hash(data: bytes, digest_size: int) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=digest_size).digest(), "little", signed=digest_size == 8)
+
+def _transcript_shingles(text: str, size: int = SHINGLE_SIZE) -> set[str]:
+    tokens = re.findall(r"\w+", text.lower())
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def compute_minhash_signature(text: str, num_perm: int = MINHASH_PERMUTATIONS) -> list[int]:
+    """MinHash signature over word shingles; empty when the text has no words."""
+    shingles = _transcript_shingles(text or "")
+    if not shingles:
+        return []
+
+    import numpy as np
+    # Fixed seed: signatures are persisted and must stay comparable across processes.
+    rng = np.random.default_rng(1)
+    a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    hashes = np.array([_stable_hash(s.encode(), 4) % _MERSENNE_PRIME for s in shingles], dtype=np.uint64)
+    permuted = (np.outer(hashes, a) + b) % _MERSENNE_PRIME
+    return permuted.min(axis=0).tolist()
+
+def minhash_band_hashes(signature: list[int], bands: int = MINHASH_BANDS) -> list[int]:
+    """One signed 64-bit hash per LSH band; signatures sharing any band are duplicate candidates."""
+    if not signature:
+        return []
+    rows = len(signature) // bands
+    return [_stable_hash(json.dumps(signature[i * rows:(i + 1) * rows]).encode(), 8) for i in range(bands)]
+
+def estimate_jaccard_similarity(signature1: list[int], signature2: list[int]) -> float:
+    if not signature1 or len(signature1) != len(signature2):
+        return 0.0
+    return sum(x == y for x, y in zip(signature1, signature2)) / len(signature1)
+
 def calculate_cosine_similarity(vec1: list, vec2: list) -> float:
+    from scipy.spatial.distance import cosine
     return 1 - cosine(vec1, vec2)
+
+def batch_top_k_similar(query_vectors, corpus_vectors, k: int, exclude_indices: list[int] | None = None, block_size: int = 1024, normalized: bool = False) -> list[list[tuple[int, float]]]:
+    """Top-k cosine neighbors of every query row against the corpus.
+
+    The query x corpus similarity matrix is computed tile by tile, so memory
+    stays bounded by block_size * (block_size + k) scores regardless of how many
+    calls are stored. exclude_indices[i] is a corpus row to skip for query i
+    (the query's own call), or -1 for none. Callers that search the same corpus
+    repeatedly should pass float32 arrays from embedding_index.normalize with normalized=True,
+    so the corpus is not converted again on every call.
+    """
+    if k <= 0 or len(query_vectors) == 0 or len(corpus_vectors) == 0:
+        return [[] for _ in range(len(query_vectors))]
+
+    import numpy as np
+    from Ai_Services.embedding_index import normalize
+
+    if normalized:
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        corpus = np.asarray(corpus_vectors, dtype=np.float32)
+    else:
+        queries = normalize(query_vectors)
+        corpus = normalize(corpus_vectors)
+    excluded = np.asarray(exclude_indices if exclude_indices is not None else [-1] * len(queries), dtype=np.int64)
+    k = min(k, len(corpus))
+
+    results = []
+    for q_start in range(0, len(queries), block_size):
+        q_block = queries[q_start:q_start + block_size]
+        q_excluded = excluded[q_start:q_start + block_size]
+        rows = np.arange(len(q_block))
+        best_scores = np.full((len(q_block), k), -np.inf, dtype=np.float32)
+        best_indices = np.full((len(q_block), k), -1, dtype=np.int64)
+
+        for c_start in range(0, len(corpus), block_size):
+            c_block = corpus[c_start:c_start + block_size]
+            scores = q_block @ c_block.T
+
+            local = q_excluded - c_start
+            in_block = (local >= 0) & (local < len(c_block))
+            scores[rows[in_block], local[in_block]] = -np.inf
+
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            block_indices = np.broadcast_to(np.arange(c_start, c_start + len(c_block)), scores.shape)
+            merged_indices = np.concatenate([best_indices, block_indices], axis=1)
+            top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, top, axis=1)
+            best_indices = np.take_along_axis(merged_indices, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_indices = np.take_along_axis(best_indices, order, axis=1)
+        for scores_row, indices_row in zip(best_scores, best_indices):
+            results.append([(int(i), float(s)) for i, s in zip(indices_row, scores_row) if np.isfinite(s)])
+    return results
         
 def generate_coaching_nudges(transcript: str) -> list[str]:
     client = get_openai_client()
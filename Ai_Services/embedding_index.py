@@ -0,0 +1,236 @@
+import numpy as np
+
+# Compact in-memory representations of the stored transcript embeddings. Vectors are
+# L2-normalised before encoding so inner products approximate cosine similarity, and
+# the index only keeps codes: full vectors stay in the database and are fetched for
+# the handful of candidates that get re-ranked exactly. Per call it holds just the code, the
+# call's database id and its duplicate cluster root, in numpy arrays sorted by id; call
+# lookups use binary search rather than a dict, and public call ids come from the database
+# with the re-ranked rows. Scoring walks the codes in tiles of
+# SCORE_BLOCK_SIZE rows so each query's temporaries stay small next to the index itself.
+SCORE_BLOCK_SIZE = 4096
+
+def normalize(vectors) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class ScalarQuantizer:
+    """Per-dimension int8 quantization: one byte per dimension."""
+
+    def fit(self, vectors: np.ndarray) -> "ScalarQuantizer":
+        self.minimum = vectors.min(axis=0)
+        self.scale = (vectors.max(axis=0) - self.minimum) / 255.0
+        self.scale[self.scale == 0] = 1.0
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        levels = np.rint((vectors - self.minimum) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.minimum + (codes.astype(np.float32) + 128) * self.scale
+
+    @property
+    def nbytes(self) -> int:
+        return self.minimum.nbytes + self.scale.nbytes
+
+    def scores(self, query: np.ndarray, codes: np.ndarray, block_size: int = SCORE_BLOCK_SIZE) -> np.ndarray:
+        # q . x = q . min + (q * scale) . (code + 128), computed without decoding the whole index.
+        weights = query * self.scale
+        offset = float(query @ self.minimum) + 128.0 * float(weights.sum())
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), block_size):
+            out[start:start + block_size] = codes[start:start + block_size].astype(np.float32) @ weights + offset
+        return out
+
+
+class ProductQuantizer:
+    """Splits vectors into subspaces, each encoded as the id of its nearest k-means centroid."""
+
+    def __init__(self, num_subspaces: int = 48, num_centroids: int = 256, iterations: int = 20, seed: int = 0):
+        self.num_subspaces = num_subspaces
+        self.num_centroids = num_centroids
+        self.iterations = iterations
+        self.seed = seed
+
+    def fit(self, vectors: np.ndarray) -> "ProductQuantizer":
+        dim = vectors.shape[1]
+        if dim % self.num_subspaces:
+            raise ValueError(f"Embedding dimension {dim} is not divisible by {self.num_subspaces} subspaces")
+        self.sub_dim = dim // self.num_subspaces
+        centroids = min(self.num_centroids, len(vectors))
+        rng = np.random.default_rng(self.seed)
+        self.codebooks = np.stack([
+            self._kmeans(self._subspace(vectors, m), centroids, rng)
+            for m in range(self.num_subspaces)
+        ])
+        return self
+
+    def _subspace(self, vectors: np.ndarray, m: int) -> np.ndarray:
+        return vectors[:, m * self.sub_dim:(m + 1) * self.sub_dim]
+
+    def _kmeans(self, points: np.ndarray, k: int, rng) -> np.ndarray:
+        centroids = points[rng.choice(len(points), size=k, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = self._nearest(points, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, points)
+            counts = np.bincount(assignment, minlength=k)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        return centroids
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (points ** 2).sum(axis=1, keepdims=True) - 2 * points @ centroids.T + (centroids ** 2).sum(axis=1)
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.stack([
+            self._nearest(self._subspace(vectors, m), self.codebooks[m])
+            for m in range(self.num_subspaces)
+        ], axis=1).astype(np.uint8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.concatenate([self.codebooks[m][codes[:, m]] for m in range(self.num_subspaces)], axis=1)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codebooks.nbytes
+
+    def scores(self, query: np.ndarray, codes: np.ndarray, block_size: int = SCORE_BLOCK_SIZE) -> np.ndarray:
+        # Asymmetric distance computation: the query stays exact, and its inner product with
+        # every centroid is tabulated once per subspace, so each code costs num_subspaces lookups.
+        tables = np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.num_subspaces, self.sub_dim)).astype(np.float32)
+        out = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), block_size):
+            block = codes[start:start + block_size]
+            tile = out[start:start + block_size]
+            for m in range(self.num_subspaces):
+                tile += tables[m][block[:, m]]
+        return out
+
+
+class EmbeddingIndex:
+    """Quantized embeddings of every call, searchable by approximate cosine similarity."""
+
+    def __init__(self, quantizer, call_db_ids, roots, codes: np.ndarray, mode: str | None = None):
+        call_db_ids = np.asarray(call_db_ids, dtype=np.int64)
+        roots = np.asarray(roots, dtype=np.int64)
+        if (np.diff(call_db_ids) < 0).any():
+            order = np.argsort(call_db_ids, kind="stable")
+            call_db_ids, roots, codes = call_db_ids[order], roots[order], codes[order]
+        self.mode = mode
+        self.quantizer = quantizer
+        self.call_db_ids = call_db_ids
+        self.roots = roots
+        self.codes = codes
+
+    @staticmethod
+    def train(mode: str, matrix: np.ndarray, pq_subspaces: int = 48, training_sample: int = 10000):
+        if mode == "int8":
+            return ScalarQuantizer().fit(matrix)
+        if mode == "pq":
+            rng = np.random.default_rng(0)
+            sample = matrix[rng.choice(len(matrix), size=min(training_sample, len(matrix)), replace=False)]
+            return ProductQuantizer(num_subspaces=pq_subspaces).fit(sample)
+        raise ValueError(f"Unknown embedding index mode: {mode}")
+
+    @classmethod
+    def build(cls, mode: str, call_db_ids: list[int], roots: list[int], vectors, pq_subspaces: int = 48) -> "EmbeddingIndex":
+        """Train a quantizer on vectors and encode them all."""
+        matrix = normalize(vectors)
+        quantizer = cls.train(mode, matrix, pq_subspaces=pq_subspaces)
+        return cls(quantizer, call_db_ids, roots, quantizer.encode(matrix), mode=mode)
+
+    # Indexes are never modified in place: requests may be searching one while it is refreshed.
+
+    def extended(self, call_db_ids: list[int], roots: list[int], vectors) -> "EmbeddingIndex":
+        """New index with extra calls encoded by the existing quantizer."""
+        if not len(call_db_ids):
+            return self
+        return EmbeddingIndex(
+            self.quantizer,
+            np.concatenate([self.call_db_ids, np.asarray(call_db_ids, dtype=np.int64)]),
+            np.concatenate([self.roots, np.asarray(roots, dtype=np.int64)]),
+            np.concatenate([self.codes, self.quantizer.encode(normalize(vectors))]),
+            mode=self.mode,
+        )
+
+    def with_roots(self, roots_by_call: dict[int, int]) -> "EmbeddingIndex":
+        """New index sharing these codes, with duplicate cluster roots updated."""
+        roots = self.call_db_ids.copy()
+        if roots_by_call:
+            calls = np.fromiter(roots_by_call.keys(), dtype=np.int64, count=len(roots_by_call))
+            found = self.contains(calls)
+            roots[np.searchsorted(self.call_db_ids, calls[found])] = np.fromiter(roots_by_call.values(), dtype=np.int64, count=len(roots_by_call))[found]
+        return EmbeddingIndex(self.quantizer, self.call_db_ids, roots, self.codes, mode=self.mode)
+
+    def contains(self, call_db_ids) -> np.ndarray:
+        """Boolean mask of which of the given call ids are indexed."""
+        call_db_ids = np.asarray(call_db_ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.call_db_ids, call_db_ids), max(len(self) - 1, 0))
+        return (self.call_db_ids[positions] == call_db_ids) if len(self) else np.zeros(len(call_db_ids), dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.call_db_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.call_db_ids.nbytes + self.roots.nbytes + self.codes.nbytes + self.quantizer.nbytes
+
+    @property
+    def bytes_per_call(self) -> float:
+        """Resident size of the whole index divided by the number of calls in it."""
+        return self.nbytes / len(self) if len(self) else 0.0
+
+    def candidates(self, query_vector, k: int, exclude_call_db_id: int | None = None, collapse_duplicates: bool = False, exclude_root: int | None = None) -> list[int]:
+        """Database ids of the k best calls by approximate score, best first.
+
+        With collapse_duplicates only cluster roots are returned, never the exclude_root cluster.
+        """
+        if k <= 0 or not len(self):
+            return []
+        query = normalize(query_vector)[0]
+        scores = self.quantizer.scores(query, self.codes)
+        if collapse_duplicates:
+            scores[(self.roots != self.call_db_ids) | (self.roots == exclude_root)] = -np.inf
+        if exclude_call_db_id is not None and self.contains([exclude_call_db_id])[0]:
+            scores[np.searchsorted(self.call_db_ids, exclude_call_db_id)] = -np.inf
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [int(self.call_db_ids[i]) for i in top if np.isfinite(scores[i])]
+
+
+def rerank(query_vector, candidate_vectors: dict[int, list[float]], limit: int) -> list[tuple[int, float]]:
+    """Exact cosine re-ranking of a small candidate set; keys are call database ids."""
+    if not candidate_vectors:
+        return []
+    keys = list(candidate_vectors)
+    scores = normalize([candidate_vectors[key] for key in keys]) @ normalize(query_vector)[0]
+    order = np.argsort(-scores)[:limit]
+    return [(keys[i], float(scores[i])) for i in order]
+
+
+def recall_at_k(index: EmbeddingIndex, call_db_ids: list[int], vectors, k: int = 5, rerank_candidates: int = 50, queries: int = 200, seed: int = 0) -> float:
+    """Fraction of the exact top-k neighbors recovered by index search plus exact re-ranking."""
+    matrix = normalize(vectors)
+    call_db_ids = np.asarray(call_db_ids, dtype=np.int64)
+    row_of = {int(call_db_id): row for row, call_db_id in enumerate(call_db_ids)}
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(matrix), size=min(queries, len(matrix)), replace=False)
+    hits = total = 0
+    for q in sample:
+        exact_scores = matrix @ matrix[q]
+        exact_scores[q] = -np.inf
+        exact = set(call_db_ids[np.argsort(-exact_scores)[:k]].tolist())
+        candidates = index.candidates(matrix[q], rerank_candidates, exclude_call_db_id=int(call_db_ids[q]))
+        found = {c for c, _ in rerank(matrix[q], {c: matrix[row_of[c]] for c in candidates}, k)}
+        hits += len(exact & found)
+        total += len(exact)
+    return hits / total if total else 0.0
@@ -0,0 +1,137 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import func, or_
+import logging
+import os
+import random
+import threading
+from typing import Optional
+from Database import models
+
+logger = logging.getLogger(__name__)
+
+# Transcripts are stored either as plain transcript_text or, when TRANSCRIPT_COMPRESSION=zstd,
+# as a zstd frame in transcript_compressed made with a dictionary trained on a sample of calls.
+# Dictionaries are versioned rows in compression_dictionaries; a frame records the version it
+# needs, so training a new dictionary never invalidates rows written with an older one.
+TRANSCRIPT_COMPRESSION = os.getenv("TRANSCRIPT_COMPRESSION", "none")
+TRANSCRIPT_COMPRESSION_LEVEL = int(os.getenv("TRANSCRIPT_COMPRESSION_LEVEL", "9"))
+DICTIONARY_SIZE = int(os.getenv("TRANSCRIPT_DICTIONARY_SIZE", str(64 * 1024)))
+
+_dictionaries = {}
+_cache_lock = threading.Lock()
+# zstd (de)compressor objects are not thread-safe, so each thread keeps its own.
+_local = threading.local()
+
+def _zstd_dictionary(db: Session, dict_id: int):
+    import zstandard
+    if dict_id not in _dictionaries:
+        with _cache_lock:
+            if dict_id not in _dictionaries:
+                row = db.get(models.CompressionDictionary, dict_id)
+                if row is None:
+                    raise LookupError(f"Compression dictionary {dict_id} not found")
+                _dictionaries[dict_id] = zstandard.ZstdCompressionDict(row.dict_data)
+    return _dictionaries[dict_id]
+
+def _decompressor(db: Session, dict_id: int):
+    import zstandard
+    cache = _local.__dict__.setdefault("decompressors", {})
+    if dict_id not in cache:
+        cache[dict_id] = zstandard.ZstdDecompressor(dict_data=_zstd_dictionary(db, dict_id))
+    return cache[dict_id]
+
+def _compressor(db: Session, dict_id: int):
+    import zstandard
+    cache = _local.__dict__.setdefault("compressors", {})
+    if dict_id not in cache:
+        cache[dict_id] = zstandard.ZstdCompressor(level=TRANSCRIPT_COMPRESSION_LEVEL, dict_data=_zstd_dictionary(db, dict_id))
+    return cache[dict_id]
+
+def get_transcript_text(transcript: Optional[models.Transcript], db: Optional[Session] = None) -> Optional[str]:
+    """Plain text of a transcript, decompressing it if it is stored as a zstd frame."""
+    if transcript is None:
+        return None
+    if transcript.transcript_compressed is None:
+        return transcript.transcript_text
+    db = db or Session.object_session(transcript)
+    return _decompressor(db, transcript.compression_dict_id_fk).decompress(transcript.transcript_compressed).decode("utf-8")
+
+def current_dictionary_id(db: Session) -> Optional[int]:
+    return db.query(func.max(models.CompressionDictionary.id)).scalar()
+
+def set_transcript_text(db: Session, transcript: models.Transcript, text: Optional[str], dict_id: Optional[int] = None) -> None:
+    """Store text compressed with the given (default: latest) dictionary when compression is on."""
+    if TRANSCRIPT_COMPRESSION != "zstd" or text is None:
+        transcript.transcript_text, transcript.transcript_compressed, transcript.compression_dict_id_fk = text, None, None
+        return
+    dict_id = dict_id or current_dictionary_id(db)
+    if dict_id is None:
+        logger.warning("TRANSCRIPT_COMPRESSION=zstd but no dictionary has been trained yet; storing plain text.")
+        transcript.transcript_text, transcript.transcript_compressed, transcript.compression_dict_id_fk = text, None, None
+        return
+    transcript.transcript_compressed = _compressor(db, dict_id).compress(text.encode("utf-8"))
+    transcript.compression_dict_id_fk = dict_id
+    transcript.transcript_text = None
+
+def train_compression_dictionary(db: Session, sample_size: int = 2000) -> Optional[int]:
+    """Train a new dictionary version on a random sample of stored transcripts."""
+    import zstandard
+    transcript_ids = [row[0] for row in db.query(models.Transcript.id).filter(
+        or_(models.Transcript.transcript_text.is_not(None), models.Transcript.transcript_compressed.is_not(None))
+    ).all()]
+    if not transcript_ids:
+        logger.warning("No transcripts available to train a compression dictionary.")
+        return None
+
+    sample_ids = random.sample(transcript_ids, min(sample_size, len(transcript_ids)))
+    sample = db.query(models.Transcript).filter(models.Transcript.id.in_(sample_ids)).all()
+    samples = [get_transcript_text(transcript, db).encode("utf-8") for transcript in sample]
+    try:
+        dictionary = zstandard.train_dictionary(DICTIONARY_SIZE, samples)
+        row = models.CompressionDictionary(dict_data=dictionary.as_bytes(), sample_count=len(samples))
+        db.add(row)
+        db.commit()
+        logger.info(f"Trained compression dictionary version {row.id} on {len(samples)} transcripts")
+        return row.id
+    except zstandard.ZstdError as e:
+        logger.error(f"Could not train compression dictionary: {e}")
+        return None
+    except SQLAlchemyError as e:
+        logger.error(f"Database error storing compression dictionary: {e}")
+        db.rollback()
+        return None
+
+def recompress_transcripts(db: Session, dict_id: Optional[int], batch_size: int = 500) -> int:
+    """Rewrite every transcript not already stored with dict_id; dict_id None decompresses to plain text."""
+    rewritten, last_id = 0, 0
+    stale = models.Transcript.transcript_text.is_not(None) if dict_id else models.Transcript.transcript_compressed.is_not(None)
+    if dict_id:
+        stale = or_(stale, models.Transcript.compression_dict_id_fk != dict_id)
+    try:
+        while True:
+            batch = (
+                db.query(models.Transcript)
+                .filter(models.Transcript.id > last_id, stale)
+                .order_by(models.Transcript.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                return rewritten
+            for transcript in batch:
+                text = get_transcript_text(transcript, db)
+                if dict_id:
+                    transcript.transcript_compressed = _compressor(db, dict_id).compress(text.encode("utf-8"))
+                    transcript.compression_dict_id_fk, transcript.transcript_text = dict_id, None
+                else:
+                    transcript.transcript_text = text
+                    transcript.transcript_compressed, transcript.compression_dict_id_fk = None, None
+            db.commit()
+            rewritten += len(batch)
+            last_id = batch[-1].id
+            logger.info(f"Rewrote {rewritten} transcripts")
+    except SQLAlchemyError as e:
+        logger.error(f"Database error rewriting transcripts: {e}")
+        db.rollback()
+        return rewritten
@@ -1,7 +1,11 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker, Session
+import itertools
 import logging
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,33 +14,176 @@ DB_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 DB_HOST = os.getenv("POSTGRES_HOST")
 DB_PORT = os.getenv("POSTGRES_PORT")
 DB_NAME = os.getenv("POSTGRES_DB")
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", "3"))
+DB_CONNECT_RETRY_DELAY = float(os.getenv("DB_CONNECT_RETRY_DELAY", "1.0"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_RETRY_INTERVAL = float(os.getenv("DB_RETRY_INTERVAL", "5"))
+
+# Read replicas: a comma-separated host list. Port and credentials default to the primary's.
+DB_READ_HOSTS = [host.strip() for host in os.getenv("POSTGRES_READ_HOSTS", "").split(",") if host.strip()]
+DB_READ_PORT = os.getenv("POSTGRES_READ_PORT", DB_PORT)
+DB_READ_USER = os.getenv("POSTGRES_READ_USER", DB_USER)
+DB_READ_PASSWORD = os.getenv("POSTGRES_READ_PASSWORD", DB_PASSWORD)
+DB_READ_RETRY_INTERVAL = float(os.getenv("DB_READ_RETRY_INTERVAL", "30"))
+
+def _pool_settings(role: str) -> dict:
+    """Pool options for one engine role; DB_<ROLE>_POOL_* overrides the shared DB_POOL_* value."""
+    def setting(name: str, default: str) -> str:
+        return os.getenv(f"DB_{role}_{name}", os.getenv(f"DB_{name}", default))
+    return {
+        "pool_size": int(setting("POOL_SIZE", "5")),
+        "max_overflow": int(setting("MAX_OVERFLOW", "10")),
+        "pool_recycle": int(setting("POOL_RECYCLE", "1800")),
+        "pool_timeout": float(setting("POOL_TIMEOUT", "30")),
+    }
+
+WRITER_POOL_SETTINGS = _pool_settings("WRITE")
+READER_POOL_SETTINGS = _pool_settings("READ")
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def create_db_engine(): 
-    if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME]):
+def create_db_engine(host: str | None = DB_HOST, port: str | None = DB_PORT, user: str | None = DB_USER, password: str | None = DB_PASSWORD,
+                     pool_settings: dict | None = None, retries: int = DB_CONNECT_RETRIES, retry_delay: float = DB_CONNECT_RETRY_DELAY):
+    if not all([user, password, host, port, DB_NAME]):
         logging.error("Database environments not set correctly....")
-        return None 
+        return None
+
+    sqlalchemy_database_url = f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{DB_NAME}"
+
+    for attempt in range(1, retries + 1):
+        try:
+            db_engine = create_engine(sqlalchemy_database_url, pool_pre_ping=True, connect_args={"connect_timeout": DB_CONNECT_TIMEOUT}, **(pool_settings or WRITER_POOL_SETTINGS))
+            with db_engine.connect() as connection:
+                logging.info(f"Database connection successful to host {host}")
+
+            return db_engine
+
+        except Exception as e:
+            logging.error(f"Database connection Failed for host {host} (attempt {attempt}/{retries}): {e}")
+            if attempt < retries:
+                time.sleep(retry_delay * 2 ** (attempt - 1))
+
+    return None
+
+# Engines are created on first use rather than at import time. The retry loop with backoff
+# only runs in init_engine (API startup and scripts); on the request path get_engine makes a
+# single attempt, and after a failure skips new attempts for DB_RETRY_INTERVAL seconds so
+# requests fail fast with 503 instead of queueing behind connection timeouts.
+_engine = None
+_engine_failed_at = float("-inf")
+_read_engines: dict[str, object] = {}
+_read_engine_failures: dict[str, float] = {}
+_read_counter = itertools.count()
+_engine_lock = threading.Lock()
+_read_engine_lock = threading.Lock()
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+def _connect_primary(retries: int) -> None:
+    global _engine, _engine_failed_at
+    _engine = create_db_engine(pool_settings=WRITER_POOL_SETTINGS, retries=retries)
+    if _engine is None:
+        _engine_failed_at = time.monotonic()
+        logging.critical("Could not create database engine.")
+    else:
+        SessionLocal.configure(bind=_engine)
+
+def init_engine():
+    """Connect to the primary with retries and backoff; for startup and scripts, not requests."""
+    with _engine_lock:
+        if _engine is None:
+            _connect_primary(retries=DB_CONNECT_RETRIES)
+    return _engine
+
+def get_engine():
+    """Engine for the primary; all writes go here."""
+    if _engine is None and time.monotonic() - _engine_failed_at >= DB_RETRY_INTERVAL:
+        # Another thread already connecting means the database is not ready yet; don't wait on it.
+        if _engine_lock.acquire(blocking=False):
+            try:
+                if _engine is None:
+                    _connect_primary(retries=1)
+            finally:
+                _engine_lock.release()
+    return _engine
+
+# A replica that fails to connect, either when its engine is created or when a pooled
+# connection fails pre-ping at checkout, is dropped and skipped for DB_READ_RETRY_INTERVAL
+# seconds, so reads move on to the next replica instead of waiting on it or erroring.
+
+def _read_host_available(host: str, now: float) -> bool:
+    return host in _read_engines or now - _read_engine_failures.get(host, float("-inf")) >= DB_READ_RETRY_INTERVAL
+
+def _read_hosts() -> list[str]:
+    """Replicas not in cooldown, rotated so each call starts at the next one in turn."""
+    now = time.monotonic()
+    hosts = [host for host in DB_READ_HOSTS if _read_host_available(host, now)]
+    if not hosts:
+        return []
+    start = next(_read_counter) % len(hosts)
+    return hosts[start:] + hosts[:start]
 
-    sqlalchemy_database_url = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    
-    try:
-        db_engine = create_engine(sqlalchemy_database_url, pool_pre_ping=True)
-        with db_engine.connect() as connection:
-            logging.info(f"Database connection successful to host {DB_HOST}")
-        
-        return db_engine
+def _get_read_engine(host: str):
+    if host not in _read_engines:
+        with _read_engine_lock:
+            if host not in _read_engines:
+                if not _read_host_available(host, time.monotonic()):
+                    return None
+                read_engine = create_db_engine(host=host, port=DB_READ_PORT, user=DB_READ_USER, password=DB_READ_PASSWORD, pool_settings=READER_POOL_SETTINGS, retries=1)
+                if read_engine is None:
+                    _read_engine_failures[host] = time.monotonic()
+                    return None
+                _read_engines[host] = read_engine
+    return _read_engines.get(host)
 
+def _mark_read_engine_failed(host: str, read_engine) -> None:
+    with _read_engine_lock:
+        _read_engine_failures[host] = time.monotonic()
+        # Another thread may already have replaced it with a fresh engine.
+        if _read_engines.get(host) is read_engine:
+            del _read_engines[host]
+    read_engine.dispose()
 
-    except Exception as e:
-        logging.error(f"Database connection Failed for host {DB_HOST}: {e}")
-        return None 
+def _get_read_session() -> Session | None:
+    """Session on the next healthy replica, round-robin; None when no replica can be reached."""
+    for host in _read_hosts():
+        read_engine = _get_read_engine(host)
+        if read_engine is None:
+            continue
+        session = SessionLocal(bind=read_engine)
+        try:
+            # Check out the session's connection now, so a replica that went down fails here
+            # rather than in the middle of the request's first query.
+            session.connection()
+            return session
+        except OperationalError as e:
+            session.close()
+            logging.error(f"Read replica {host} failed at checkout, trying the next one: {e}")
+            _mark_read_engine_failed(host, read_engine)
+    return None
 
-engine = create_db_engine()
+def get_session(read_only: bool = False) -> Session | None:
+    if read_only and DB_READ_HOSTS:
+        session = _get_read_session()
+        if session is not None:
+            return session
+        logging.warning("No read replica available, routing reads to the primary.")
+    engine = get_engine()
+    if engine is None:
+        return None
+    return SessionLocal(bind=engine)
 
-SessionLocal = None
+def _describe_pool(engine) -> dict:
+    pool = engine.pool
+    metrics = {"status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            metrics[name] = getattr(pool, name)()
+    return metrics
 
-if engine:
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-else:
-    logging.critical("Could not create database engine. Application cannot start.")
\ No newline at end of file
+def get_pool_metrics() -> dict:
+    """Connection pool usage of every engine created so far."""
+    return {
+        "writer": _describe_pool(_engine) if _engine is not None else None,
+        "readers": {host: _describe_pool(read_engine) for host, read_engine in list(_read_engines.items())},
+    }
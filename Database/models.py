@@ -1,6 +1,6 @@
 # File: app/models.py
 
-from sqlalchemy import (Column,Integer,String,Float,DateTime,Text,Index,ForeignKey)
+from sqlalchemy import (Column,Integer,BigInteger,String,Float,DateTime,Text,LargeBinary,Index,ForeignKey,func)
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -26,7 +26,7 @@ class Call(Base):
     duration_seconds = Column(Integer)
     agent_id_fk = Column(Integer, ForeignKey("agents.id"), nullable=False)
     agent = relationship("Agent", back_populates="calls")
-    transcript_data = relationship("Transcript", back_populates="call", uselist=False, cascade="all, delete-orphan")
+    transcript_data = relationship("Transcript", back_populates="call", uselist=False, cascade="all, delete-orphan", foreign_keys="Transcript.call_id_fk")
 
 
 
@@ -37,10 +37,48 @@ class Transcript(Base):
     call_id_fk = Column(Integer, ForeignKey("calls.id"), unique=True, nullable=False)
     raw_transcript_path = Column(String, nullable=True)
     transcript_text = Column(Text, nullable=True)
+    transcript_compressed = Column(LargeBinary, nullable=True)
+    compression_dict_id_fk = Column(Integer, ForeignKey("compression_dictionaries.id"), nullable=True, index=True)
     language = Column(String(10), default="en")
     agent_talk_ratio = Column(Float, nullable=True)
     customer_sentiment_score = Column(Float, nullable=True)
     embedding = Column(Text, nullable=True)
-    call = relationship("Call", back_populates="transcript_data")
+    minhash_signature = Column(Text, nullable=True)
+    duplicate_of_call_id_fk = Column(Integer, ForeignKey("calls.id"), nullable=True, index=True)
+    call = relationship("Call", back_populates="transcript_data", foreign_keys=[call_id_fk])
+    lsh_bands = relationship("TranscriptLSHBand", back_populates="transcript", cascade="all, delete-orphan")
 
-    
\ No newline at end of file
+
+class CompressionDictionary(Base):
+    __tablename__ = "compression_dictionaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    dict_data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class TranscriptLSHBand(Base):
+    __tablename__ = "transcript_lsh_bands"
+
+    id = Column(Integer, primary_key=True, index=True)
+    transcript_id_fk = Column(Integer, ForeignKey("transcripts.id", ondelete="CASCADE"), nullable=False, index=True)
+    band_index = Column(Integer, nullable=False)
+    band_hash = Column(BigInteger, nullable=False)
+    transcript = relationship("Transcript", back_populates="lsh_bands")
+
+    __table_args__ = (Index("ix_transcript_lsh_bands_band", "band_index", "band_hash"),)
+
+    
+
+class CallNeighbor(Base):
+    __tablename__ = "call_neighbors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    call_id_fk = Column(Integer, ForeignKey("calls.id", ondelete="CASCADE"), nullable=False, index=True)
+    neighbor_call_id_fk = Column(Integer, ForeignKey("calls.id", ondelete="CASCADE"), nullable=False)
+    rank = Column(Integer, nullable=False)
+    similarity_score = Column(Float, nullable=False)
+    neighbor_call = relationship("Call", foreign_keys=[neighbor_call_id_fk])
+
+    __table_args__ = (Index("ix_call_neighbors_call_rank", "call_id_fk", "rank", unique=True),)
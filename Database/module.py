@@ -2,17 +2,34 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 import json
+import os
+import threading
+import time
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy import func, and_, or_
 from typing import List, Optional
 from datetime import date,timedelta
 from . import models, schemas
-from Ai_Services.ai_services import calculate_cosine_similarity
+from Ai_Services.ai_services import calculate_cosine_similarity, batch_top_k_similar, compute_minhash_signature, minhash_band_hashes, estimate_jaccard_similarity
 from Database import models,schemas
+from Database.compression import get_transcript_text, set_transcript_text
+from Database.connection import get_session
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DUPLICATE_SIMILARITY_THRESHOLD = float(os.getenv("DUPLICATE_SIMILARITY_THRESHOLD", "0.9"))
+EMBEDDING_INDEX_MODE = os.getenv("EMBEDDING_INDEX_MODE", "exact")
+EMBEDDING_PQ_SUBSPACES = int(os.getenv("EMBEDDING_PQ_SUBSPACES", "48"))
+EMBEDDING_RERANK_CANDIDATES = int(os.getenv("EMBEDDING_RERANK_CANDIDATES", "50"))
+EMBEDDING_INDEX_CHECK_INTERVAL = float(os.getenv("EMBEDDING_INDEX_CHECK_INTERVAL", "30"))
+
+_embedding_index = None
+_embedding_index_version = None
+_embedding_index_trained_size = 0
+_embedding_index_checked_at = float("-inf")
+_embedding_index_refresh_lock = threading.Lock()
+
 
 def get_or_create_agent(db: Session, agent_id: str, name: str) -> models.Agent | None:
     try:
@@ -38,6 +55,107 @@ def get_or_create_agent(db: Session, agent_id: str, name: str) -> models.Agent |
         db.rollback()
         return None
 
+def _find_duplicate_root(db: Session, signature: list[int], band_hashes: list[int], exclude_transcript_id: Optional[int] = None) -> Optional[int]:
+    """Call id of the closest cluster root sharing an LSH band with the signature.
+
+    Only roots keep band rows, so a near-copy of a large cluster is compared with
+    its root once rather than with every member.
+    """
+    band_matches = or_(*[
+        and_(models.TranscriptLSHBand.band_index == i, models.TranscriptLSHBand.band_hash == band_hash)
+        for i, band_hash in enumerate(band_hashes)
+    ])
+    candidate_ids = db.query(models.TranscriptLSHBand.transcript_id_fk).filter(band_matches)
+    if exclude_transcript_id is not None:
+        candidate_ids = candidate_ids.filter(models.TranscriptLSHBand.transcript_id_fk != exclude_transcript_id)
+    candidates = (
+        db.query(models.Transcript.call_id_fk, models.Transcript.minhash_signature)
+        .filter(models.Transcript.id.in_(candidate_ids.distinct()), models.Transcript.duplicate_of_call_id_fk.is_(None))
+        .all()
+    )
+
+    best_root, best_score = None, DUPLICATE_SIMILARITY_THRESHOLD
+    for call_db_id, candidate_signature in candidates:
+        score = estimate_jaccard_similarity(signature, json.loads(candidate_signature))
+        if score >= best_score:
+            best_root, best_score = call_db_id, score
+    return best_root
+
+def _reassign_duplicate_cluster(db: Session, old_root: int, new_root: int) -> None:
+    logger.info(f"Moving near-duplicate cluster of call ID {old_root} under older call ID {new_root}")
+    (
+        db.query(models.Transcript)
+        .filter(or_(models.Transcript.call_id_fk == old_root, models.Transcript.duplicate_of_call_id_fk == old_root))
+        .update({models.Transcript.duplicate_of_call_id_fk: new_root}, synchronize_session="fetch")
+    )
+    # The old root is now a member, so it stops answering band lookups.
+    old_root_transcript_ids = db.query(models.Transcript.id).filter(models.Transcript.call_id_fk == old_root)
+    (
+        db.query(models.TranscriptLSHBand)
+        .filter(models.TranscriptLSHBand.transcript_id_fk.in_(old_root_transcript_ids))
+        .delete(synchronize_session="fetch")
+    )
+
+def index_transcript_duplicates(db: Session, transcript: models.Transcript, text: Optional[str]) -> None:
+    """Store the MinHash signature of a transcript and link it to a near-duplicate cluster root.
+
+    Band rows are only written when the transcript becomes a root itself.
+    """
+    signature = compute_minhash_signature(text or "")
+    if not signature:
+        return
+    band_hashes = minhash_band_hashes(signature)
+    root = _find_duplicate_root(db, signature, band_hashes, exclude_transcript_id=transcript.id)
+    if root is not None and transcript.call_id_fk is not None and transcript.call_id_fk < root:
+        # A backfilled call older than the cluster root found for it becomes the new root.
+        _reassign_duplicate_cluster(db, old_root=root, new_root=transcript.call_id_fk)
+        root = None
+    transcript.duplicate_of_call_id_fk = root
+    transcript.minhash_signature = json.dumps(signature)
+    transcript.lsh_bands = [] if root is not None else [
+        models.TranscriptLSHBand(band_index=i, band_hash=band_hash) for i, band_hash in enumerate(band_hashes)
+    ]
+
+def backfill_duplicate_index(db: Session, batch_size: int = 500) -> int:
+    """Index transcripts ingested before duplicate detection.
+
+    The earliest call of a cluster is its root, also when newer calls were ingested
+    (and indexed) before the backfill ran: their cluster is moved under the older call.
+    Band rows left on cluster members by earlier versions are removed first.
+    """
+    indexed, last_id = 0, 0
+    try:
+        member_ids = db.query(models.Transcript.id).filter(models.Transcript.duplicate_of_call_id_fk.is_not(None))
+        removed = db.query(models.TranscriptLSHBand).filter(models.TranscriptLSHBand.transcript_id_fk.in_(member_ids)).delete(synchronize_session=False)
+        db.commit()
+        if removed:
+            logger.info(f"Removed {removed} LSH band rows of near-duplicate cluster members")
+        while True:
+            batch = (
+                db.query(models.Transcript)
+                .filter(
+                    models.Transcript.id > last_id,
+                    models.Transcript.minhash_signature.is_(None),
+                    or_(models.Transcript.transcript_text.is_not(None), models.Transcript.transcript_compressed.is_not(None))
+                )
+                .order_by(models.Transcript.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                return indexed
+            for transcript in batch:
+                index_transcript_duplicates(db, transcript, get_transcript_text(transcript, db))
+                db.flush()
+            db.commit()
+            indexed += len(batch)
+            last_id = batch[-1].id
+            logger.info(f"Indexed {indexed} transcripts for duplicate detection")
+    except SQLAlchemyError as e:
+        logger.error(f"Database error backfilling duplicate index: {e}")
+        db.rollback()
+        return indexed
+
 def create_call_with_transcript(db: Session, call_data: schemas.CallCreate, agent: models.Agent) -> models.Call | None:
     
     try:
@@ -51,10 +169,13 @@ def create_call_with_transcript(db: Session, call_data: schemas.CallCreate, agen
         )
         db_transcript = models.Transcript(
             raw_transcript_path=call_data.raw_transcript_path,
-            transcript_text=call_data.transcript,
             language=call_data.language,
             call=db_call 
         )
+        set_transcript_text(db, db_transcript, call_data.transcript)
+        index_transcript_duplicates(db, db_transcript, call_data.transcript)
+        if db_transcript.duplicate_of_call_id_fk:
+            logger.info(f"Call {call_data.call_id} flagged as near-duplicate of call ID {db_transcript.duplicate_of_call_id_fk}")
         db.add(db_call)
         db.add(db_transcript)
         db.commit()
@@ -108,7 +229,7 @@ def get_calls(
         query = query.filter(models.Call.start_time < to_date)
 
     if min_sentiment is not None or max_sentiment is not None:
-        query = query.join(models.Transcript)
+        query = query.join(models.Transcript, models.Call.id == models.Transcript.call_id_fk)
         if min_sentiment is not None:
             query = query.filter(models.Transcript.customer_sentiment_score >= min_sentiment)
         if max_sentiment is not None:
@@ -116,8 +237,8 @@ def get_calls(
 
     return query.order_by(models.Call.start_time.desc()).offset(skip).limit(limit).all()
 
-def get_agent_analytics(db: Session) -> list:
-    results = (
+def get_agent_analytics(db: Session, collapse_duplicates: bool = False) -> list:
+    query = (
         db.query(
             models.Agent.agent_id,
             func.avg(models.Transcript.customer_sentiment_score).label("average_sentiment"),
@@ -126,20 +247,33 @@ def get_agent_analytics(db: Session) -> list:
         )
         .join(models.Call, models.Agent.id == models.Call.agent_id_fk)
         .join(models.Transcript, models.Call.id == models.Transcript.call_id_fk)
-        .group_by(models.Agent.agent_id)
+    )
+    if collapse_duplicates:
+        query = query.filter(models.Transcript.duplicate_of_call_id_fk.is_(None))
+    results = (
+        query.group_by(models.Agent.agent_id)
         .order_by(func.count(models.Call.id).desc())
         .all()
     )
     return results
 
-def find_similar_calls(db: Session, target_call: models.Call, limit: int = 5) -> list[dict]:
+def find_similar_calls(db: Session, target_call: models.Call, limit: int = 5, collapse_duplicates: bool = False) -> list[dict]:
     target_transcript = target_call.transcript_data
     if not target_transcript or not target_transcript.embedding:
         return []
 
     target_embedding = json.loads(target_transcript.embedding)
+    if EMBEDDING_INDEX_MODE != "exact":
+        index = get_embedding_index(db)
+        # Until the first background build finishes, requests use the exact scan below.
+        if index is not None:
+            return _find_similar_calls_indexed(db, index, target_call, target_embedding, limit, collapse_duplicates)
     
-    all_other_transcripts = db.query(models.Transcript).filter(models.Transcript.id != target_transcript.id, models.Transcript.embedding.is_not(None)).all()
+    query = db.query(models.Transcript).filter(models.Transcript.id != target_transcript.id, models.Transcript.embedding.is_not(None))
+    if collapse_duplicates:
+        target_root = target_transcript.duplicate_of_call_id_fk or target_call.id
+        query = query.filter(models.Transcript.duplicate_of_call_id_fk.is_(None), models.Transcript.call_id_fk != target_root)
+    all_other_transcripts = query.all()
     
     similarities = []
     for other_ts in all_other_transcripts:
@@ -154,4 +288,227 @@ def find_similar_calls(db: Session, target_call: models.Call, limit: int = 5) ->
             continue
 
     similarities.sort(key=lambda x: x['similarity_score'], reverse=True)
-    return similarities[:limit]
\ No newline at end of file
+    return similarities[:limit]
+
+def _load_embedding_corpus(db: Session, call_db_ids: Optional[List[int]] = None) -> tuple[list[int], list[str], "np.ndarray", list[int]]:
+    """Embeddings decoded row by row into one preallocated float32 matrix, never a list of lists."""
+    import numpy as np
+    query = (
+        db.query(models.Call.id, models.Call.call_id, models.Transcript.embedding, models.Transcript.duplicate_of_call_id_fk)
+        .join(models.Transcript, models.Call.id == models.Transcript.call_id_fk)
+        .filter(models.Transcript.embedding.is_not(None))
+    )
+    if call_db_ids is not None:
+        query = query.filter(models.Call.id.in_(call_db_ids))
+    capacity = query.count()
+
+    db_ids, call_ids, roots = [], [], []
+    matrix = None
+    for call_db_id, call_id, embedding, duplicate_of in query.yield_per(1000):
+        # Rows embedded after the count are left for the next load.
+        if len(db_ids) == capacity:
+            break
+        try:
+            vector = json.loads(embedding)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if matrix is None:
+            matrix = np.empty((capacity, len(vector)), dtype=np.float32)
+        elif len(vector) != matrix.shape[1]:
+            logger.warning(f"Skipping embedding of call {call_id} with unexpected dimension {len(vector)}")
+            continue
+        matrix[len(db_ids)] = vector
+        db_ids.append(call_db_id)
+        call_ids.append(call_id)
+        roots.append(duplicate_of or call_db_id)
+    if matrix is None:
+        matrix = np.empty((0, 0), dtype=np.float32)
+    return db_ids, call_ids, matrix[:len(db_ids)], roots
+
+def find_similar_calls_batch(db: Session, call_db_ids: List[int], limit: int = 5, block_size: int = 1024, collapse_duplicates: bool = False) -> dict[int, list[dict]]:
+    """Top-k similar calls for many source calls, decoding the embedding set once.
+
+    With collapse_duplicates only cluster roots are candidates, and a source's own
+    cluster is excluded, so each near-duplicate cluster appears at most once.
+    """
+    db_ids, call_ids, vectors, roots = _load_embedding_corpus(db)
+    position = {call_db_id: i for i, call_db_id in enumerate(db_ids)}
+    cluster = roots if collapse_duplicates else db_ids
+    corpus = [i for i, call_db_id in enumerate(db_ids) if cluster[i] == call_db_id]
+    corpus_position = {db_ids[i]: j for j, i in enumerate(corpus)}
+
+    sources = [call_db_id for call_db_id in dict.fromkeys(call_db_ids) if call_db_id in position]
+    query_vectors = vectors[[position[call_db_id] for call_db_id in sources]]
+    exclude = [corpus_position.get(cluster[position[call_db_id]], -1) for call_db_id in sources]
+    corpus_vectors = vectors[corpus] if collapse_duplicates else vectors
+
+    neighbors = batch_top_k_similar(query_vectors, corpus_vectors, k=limit, exclude_indices=exclude, block_size=block_size)
+    return {
+        call_db_id: [{"similar_call_id": call_ids[corpus[j]], "similarity_score": score} for j, score in hits]
+        for call_db_id, hits in zip(sources, neighbors)
+    }
+
+def precompute_call_neighbors(db: Session, limit: int = 5, block_size: int = 1024) -> int:
+    """Recompute and store the neighbor list of every call with an embedding."""
+    from Ai_Services.embedding_index import normalize
+    db_ids, _, vectors, _ = _load_embedding_corpus(db)
+    if not db_ids:
+        return 0
+
+    # Convert and normalize once; every block below searches the same corpus array.
+    corpus = normalize(vectors)
+    del vectors
+    exclude = list(range(len(db_ids)))
+    try:
+        db.query(models.CallNeighbor).delete(synchronize_session=False)
+        for start in range(0, len(db_ids), block_size):
+            neighbors = batch_top_k_similar(corpus[start:start + block_size], corpus, k=limit, exclude_indices=exclude[start:start + block_size], block_size=block_size, normalized=True)
+            db.bulk_insert_mappings(models.CallNeighbor, [
+                {"call_id_fk": db_ids[start + offset], "neighbor_call_id_fk": db_ids[i], "rank": rank, "similarity_score": score}
+                for offset, hits in enumerate(neighbors)
+                for rank, (i, score) in enumerate(hits)
+            ])
+        db.commit()
+        logger.info(f"Stored neighbor lists for {len(db_ids)} calls")
+        return len(db_ids)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error precomputing call neighbors: {e}")
+        db.rollback()
+        return 0
+
+def get_call_ids_by_db_ids(db: Session, call_db_ids: List[int]) -> dict[int, str]:
+    return dict(db.query(models.Call.id, models.Call.call_id).filter(models.Call.id.in_(call_db_ids)).all())
+
+def get_precomputed_neighbors(db: Session, call_db_ids: List[int], limit: int = 5) -> dict[int, list[dict]]:
+    rows = (
+        db.query(models.CallNeighbor.call_id_fk, models.Call.call_id, models.CallNeighbor.similarity_score)
+        .join(models.Call, models.Call.id == models.CallNeighbor.neighbor_call_id_fk)
+        .filter(models.CallNeighbor.call_id_fk.in_(call_db_ids), models.CallNeighbor.rank < limit)
+        .order_by(models.CallNeighbor.call_id_fk, models.CallNeighbor.rank)
+        .all()
+    )
+    neighbors: dict[int, list[dict]] = {}
+    for call_db_id, similar_call_id, score in rows:
+        neighbors.setdefault(call_db_id, []).append({"similar_call_id": similar_call_id, "similarity_score": score})
+    return neighbors
+
+
+def _embedding_corpus_version(db: Session) -> tuple:
+    return (
+        db.query(func.count(models.Transcript.id), func.max(models.Transcript.id), func.count(models.Transcript.duplicate_of_call_id_fk))
+        .filter(models.Transcript.embedding.is_not(None))
+        .one()
+    )
+
+def build_embedding_index(db: Session, mode: Optional[str] = None):
+    from Ai_Services.embedding_index import EmbeddingIndex
+    mode = mode or EMBEDDING_INDEX_MODE
+    db_ids, _, vectors, roots = _load_embedding_corpus(db)
+    if not db_ids:
+        return None
+    index = EmbeddingIndex.build(mode, db_ids, roots, vectors, pq_subspaces=EMBEDDING_PQ_SUBSPACES)
+    logger.info(f"Built {mode} embedding index over {len(index)} calls, {index.bytes_per_call:.1f} bytes per call")
+    return index
+
+def refresh_embedding_index(db: Session) -> None:
+    """Bring the process-wide index up to date with the stored embeddings.
+
+    Only calls embedded since the last refresh are decoded and encoded with the
+    trained quantizer; the index is rebuilt and retrained once the corpus has doubled.
+    Requests keep searching the previous index until the new one is swapped in.
+    """
+    import numpy as np
+    global _embedding_index, _embedding_index_version, _embedding_index_trained_size
+    version = _embedding_corpus_version(db)
+    index = _embedding_index
+    if index is None or index.mode != EMBEDDING_INDEX_MODE or version[0] >= 2 * _embedding_index_trained_size:
+        index = build_embedding_index(db)
+        _embedding_index_trained_size = len(index) if index else 0
+    else:
+        embedded = db.query(models.Transcript.call_id_fk).filter(models.Transcript.embedding.is_not(None))
+        # Diffing ids rather than following an id cursor also picks up older transcripts
+        # that process_data.py embedded after the last refresh.
+        embedded_ids = np.fromiter((call_db_id for (call_db_id,) in embedded), dtype=np.int64)
+        new_call_ids = embedded_ids[~index.contains(embedded_ids)].tolist()
+        for start in range(0, len(new_call_ids), 10000):
+            db_ids, _, vectors, roots = _load_embedding_corpus(db, call_db_ids=new_call_ids[start:start + 10000])
+            index = index.extended(db_ids, roots, vectors)
+        if _embedding_index_version is None or version[2] != _embedding_index_version[2]:
+            roots_by_call = dict(
+                db.query(models.Transcript.call_id_fk, models.Transcript.duplicate_of_call_id_fk)
+                .filter(models.Transcript.duplicate_of_call_id_fk.is_not(None))
+                .all()
+            )
+            index = index.with_roots(roots_by_call)
+        logger.info(f"Added {len(new_call_ids)} calls to the embedding index")
+    _embedding_index, _embedding_index_version = index, version
+
+def _refresh_embedding_index_in_background() -> None:
+    try:
+        db = get_session(read_only=True)
+        if db is None:
+            return
+        try:
+            refresh_embedding_index(db)
+        finally:
+            db.close()
+    except Exception as e:
+        logger.error(f"Embedding index refresh failed: {e}", exc_info=True)
+    finally:
+        _embedding_index_refresh_lock.release()
+
+def schedule_embedding_index_refresh() -> bool:
+    """Refresh the index on a background thread unless a refresh is already running."""
+    if not _embedding_index_refresh_lock.acquire(blocking=False):
+        return False
+    threading.Thread(target=_refresh_embedding_index_in_background, name="embedding-index-refresh", daemon=True).start()
+    return True
+
+def get_embedding_index(db: Session):
+    """Current index, or None before the first build; never builds on the calling thread.
+
+    At most every EMBEDDING_INDEX_CHECK_INTERVAL seconds the stored embeddings are
+    compared with the indexed version, and a background refresh is started if they differ.
+    """
+    global _embedding_index_checked_at
+    now = time.monotonic()
+    if now - _embedding_index_checked_at >= EMBEDDING_INDEX_CHECK_INTERVAL:
+        _embedding_index_checked_at = now
+        if _embedding_corpus_version(db) != _embedding_index_version:
+            schedule_embedding_index_refresh()
+    return _embedding_index
+
+def _find_similar_calls_indexed(db: Session, index, target_call: models.Call, target_embedding: list[float], limit: int, collapse_duplicates: bool) -> list[dict]:
+    from Ai_Services.embedding_index import rerank
+    target_root = target_call.transcript_data.duplicate_of_call_id_fk or target_call.id
+    candidates = index.candidates(
+        target_embedding, max(limit, EMBEDDING_RERANK_CANDIDATES),
+        exclude_call_db_id=target_call.id, collapse_duplicates=collapse_duplicates, exclude_root=target_root
+    )
+    rows = (
+        db.query(models.Transcript.call_id_fk, models.Call.call_id, models.Transcript.embedding)
+        .join(models.Call, models.Call.id == models.Transcript.call_id_fk)
+        .filter(models.Transcript.call_id_fk.in_(candidates))
+        .all()
+    )
+    call_ids = {call_db_id: call_id for call_db_id, call_id, _ in rows}
+    full_vectors = {call_db_id: json.loads(embedding) for call_db_id, _, embedding in rows if embedding}
+    return [
+        {"similar_call_id": call_ids[call_db_id], "similarity_score": score}
+        for call_db_id, score in rerank(target_embedding, full_vectors, limit)
+    ]
+
+def evaluate_embedding_index(db: Session, k: int = 5, queries: int = 200) -> dict[str, dict]:
+    """Resident bytes per call and recall@k after re-ranking, for each quantization mode."""
+    from Ai_Services.embedding_index import EmbeddingIndex, recall_at_k
+    db_ids, _, vectors, roots = _load_embedding_corpus(db)
+    if not db_ids:
+        return {}
+    report = {"exact": {"bytes_per_call": vectors.itemsize * vectors.shape[1], "recall_at_k": 1.0}}
+    for mode in ("int8", "pq"):
+        index = EmbeddingIndex.build(mode, db_ids, roots, vectors, pq_subspaces=EMBEDDING_PQ_SUBSPACES)
+        report[mode] = {
+            "bytes_per_call": index.bytes_per_call,
+            "recall_at_k": recall_at_k(index, db_ids, vectors, k=k, rerank_candidates=EMBEDDING_RERANK_CANDIDATES, queries=queries),
+        }
+    return report
@@ -20,6 +20,7 @@ class Call(CallBase):
     id: int
     agent_talk_ratio: Optional[float] = Field(None, example=0.65)
     customer_sentiment_score: Optional[float] = Field(None, example=0.8)
+    duplicate_of_id: Optional[int] = Field(None, example=12)
     
     class Config:
         from_attributes = True 
@@ -37,6 +38,21 @@ class CallRecommendationResponse(BaseModel):
     recommendations: List[CallRecommendation]
     coaching_nudges: List[CoachingNudge]
 
+class BatchSimilarCallsRequest(BaseModel):
+    call_ids: List[int] = Field(..., min_length=1, max_length=5000, example=[1, 2, 3])
+    limit: int = Field(default=5, ge=1, le=50, example=5)
+    use_precomputed: bool = Field(default=False, example=False)
+    collapse_duplicates: bool = Field(default=False, example=False)
+
+class SimilarCallsResult(BaseModel):
+    call_db_id: int
+    source_call_id: str
+    recommendations: List[CallRecommendation]
+
+class BatchSimilarCallsResponse(BaseModel):
+    results: List[SimilarCallsResult]
+    missing_call_ids: List[int]
+
 class AgentAnalytics(BaseModel):
     agent_id: str
     average_sentiment: float
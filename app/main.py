@@ -1,6 +1,10 @@
 import sys
 import os
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date, timedelta
@@ -8,19 +12,47 @@ import logging
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 from Database import module as crud
 from Database import models, schemas
-from Database.connection import SessionLocal, engine
-from Ai_Services.ai_services import generate_coaching_nudges
+from Database.connection import get_engine, get_session, get_pool_metrics, init_engine
+from Database.compression import get_transcript_text
+from Ai_Services.ai_services import generate_coaching_nudges, warmup_models, get_model_status
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "false").lower() == "true"
+
+def connect_database() -> None:
+    if init_engine() is not None and crud.EMBEDDING_INDEX_MODE != "exact":
+        crud.schedule_embedding_index_refresh()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connecting may retry with backoff, so it runs beside the server rather than blocking startup.
+    threading.Thread(target=connect_database, name="db-connect", daemon=True).start()
+    if WARMUP_MODELS:
+        logger.info("Starting background model warmup...")
+        threading.Thread(target=warmup_models, name="model-warmup", daemon=True).start()
+    yield
+
 app = FastAPI(
     title="Darwix AI Call Analytics Service",
     description="An API to ingest and analyze sales call transcripts.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 def get_db():
-    db = SessionLocal()
+    db = get_session()
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db():
+    db = get_session(read_only=True)
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
     try:
         yield db
     finally:
@@ -38,15 +70,45 @@ def convert_call_model_to_schema(db_call: models.Call) -> schemas.Call:
         start_time=db_call.start_time,
         duration_seconds=db_call.duration_seconds,
         language=transcript_data.language if transcript_data else 'N/A',
-        transcript=transcript_data.transcript_text if transcript_data else 'N/A',
+        transcript=get_transcript_text(transcript_data) if transcript_data else 'N/A',
         agent_talk_ratio=transcript_data.agent_talk_ratio if transcript_data else None,
         customer_sentiment_score=transcript_data.customer_sentiment_score if transcript_data else None,
+        duplicate_of_id=transcript_data.duplicate_of_call_id_fk if transcript_data else None,
     )
 
 @app.get("/", tags=["Root"])
 def read_root():
     return {"status": "ok", "message": "Welcome to the API!"}
 
+@app.get("/health/live", tags=["Health"])
+def liveness():
+    return {"status": "ok"}
+
+@app.get("/health/ready", tags=["Health"])
+def readiness():
+    database_ready = False
+    engine = get_engine()
+    if engine is not None:
+        try:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            database_ready = True
+        except Exception as e:
+            logger.error(f"Readiness check failed to reach the database: {e}")
+
+    # A failed warmup does not block traffic: models are loaded again on first use.
+    models_status = get_model_status()
+    models_ready = not WARMUP_MODELS or models_status["warmup"] in ("ready", "failed")
+    ready = database_ready and models_ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "database": database_ready, "models": models_status}
+    )
+
+@app.get("/health/db-pools", tags=["Health"])
+def read_pool_metrics():
+    return get_pool_metrics()
+
 @app.get("/api/v1/calls", response_model=List[schemas.Call], tags=["Calls"])
 def read_calls(
     limit: int = Query(100, ge=1, le=200),
@@ -56,26 +118,47 @@ def read_calls(
     to_date: Optional[date] = None,
     min_sentiment: Optional[float] = Query(None, ge=-1, le=1),
     max_sentiment: Optional[float] = Query(None, ge=-1, le=1),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     db_calls = crud.get_calls(db, skip=offset, limit=limit, agent_id=agent_id, from_date=from_date, to_date=to_date, min_sentiment=min_sentiment, max_sentiment=max_sentiment)
     return [convert_call_model_to_schema(c) for c in db_calls]
 
+@app.post("/api/v1/calls/similar/batch", response_model=schemas.BatchSimilarCallsResponse, tags=["Calls"])
+def read_similar_calls_batch(request: schemas.BatchSimilarCallsRequest, db: Session = Depends(get_read_db)):
+    call_db_ids = list(dict.fromkeys(request.call_ids))
+    source_calls = crud.get_call_ids_by_db_ids(db, call_db_ids=call_db_ids)
+
+    neighbors = {}
+    # Stored neighbor lists are not collapsed, so collapsing always searches live.
+    if request.use_precomputed and not request.collapse_duplicates:
+        neighbors = crud.get_precomputed_neighbors(db, call_db_ids=list(source_calls), limit=request.limit)
+    # Stored lists hold NEIGHBORS_PER_CALL entries; a shorter one than requested is searched live.
+    pending = [call_db_id for call_db_id in source_calls if len(neighbors.get(call_db_id, [])) < request.limit]
+    if pending:
+        neighbors.update(crud.find_similar_calls_batch(db, call_db_ids=pending, limit=request.limit, collapse_duplicates=request.collapse_duplicates))
+
+    results = [
+        schemas.SimilarCallsResult(call_db_id=call_db_id, source_call_id=source_calls[call_db_id], recommendations=neighbors.get(call_db_id, []))
+        for call_db_id in call_db_ids if call_db_id in source_calls
+    ]
+    missing = [call_db_id for call_db_id in call_db_ids if call_db_id not in source_calls]
+    return schemas.BatchSimilarCallsResponse(results=results, missing_call_ids=missing)
+
 @app.get("/api/v1/calls/{call_db_id}", response_model=schemas.Call, tags=["Calls"])
-def read_call(call_db_id: int, db: Session = Depends(get_db)):
+def read_call(call_db_id: int, db: Session = Depends(get_read_db)):
     db_call = crud.get_call_by_id(db, call_db_id=call_db_id)
     if db_call is None:
         raise HTTPException(status_code=404, detail="Call not found")
     return convert_call_model_to_schema(db_call)
 
 @app.get("/api/v1/calls/{call_db_id}/recommendations", response_model=schemas.CallRecommendationResponse, tags=["Calls"])
-def get_call_recommendations(call_db_id: int, db: Session = Depends(get_db)):
+def get_call_recommendations(call_db_id: int, collapse_duplicates: bool = False, db: Session = Depends(get_read_db)):
     source_call = crud.get_call_by_id(db, call_db_id=call_db_id)
     if not source_call or not source_call.transcript_data:
         raise HTTPException(status_code=404, detail="Source call or its transcript not found")
 
-    similar_calls = crud.find_similar_calls(db, target_call=source_call, limit=5)
-    nudges_text = generate_coaching_nudges(source_call.transcript_data.transcript_text)
+    similar_calls = crud.find_similar_calls(db, target_call=source_call, limit=5, collapse_duplicates=collapse_duplicates)
+    nudges_text = generate_coaching_nudges(get_transcript_text(source_call.transcript_data, db))
     coaching_nudges = [{"nudge": text} for text in nudges_text]
 
     return schemas.CallRecommendationResponse(
@@ -85,6 +168,6 @@ def get_call_recommendations(call_db_id: int, db: Session = Depends(get_db)):
     )
 
 @app.get("/api/v1/analytics/agents", response_model=List[schemas.AgentAnalytics], tags=["Analytics"])
-def read_agent_analytics(db: Session = Depends(get_db)):
-    analytics = crud.get_agent_analytics(db=db)
+def read_agent_analytics(collapse_duplicates: bool = False, db: Session = Depends(get_read_db)):
+    analytics = crud.get_agent_analytics(db=db, collapse_duplicates=collapse_duplicates)
     return [schemas.AgentAnalytics.model_validate(row._asdict()) for row in analytics]
\ No newline at end of file
@@ -0,0 +1,43 @@
+import os
+import logging
+import subprocess
+import sys
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "2.0"))
+DEFERRED_MODULES = ["torch", "transformers", "sentence_transformers", "scipy", "openai", "numpy"]
+
+# Runs in a fresh interpreter so the measurement reflects a cold start of the API process.
+PROBE = f"""
+import sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+loaded = [m for m in {DEFERRED_MODULES!r} if m in sys.modules]
+print(elapsed, *loaded)
+"""
+
+def check_import_time() -> bool:
+    project_root = os.path.abspath(os.path.dirname(__file__))
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=project_root, capture_output=True, text=True)
+    if result.returncode != 0:
+        logger.error(f"Importing app.main failed:\n{result.stderr}")
+        return False
+
+    elapsed, *loaded = result.stdout.strip().splitlines()[-1].split()
+    elapsed = float(elapsed)
+    logger.info(f"app.main imported in {elapsed:.3f}s (budget {IMPORT_TIME_BUDGET_SECONDS:.3f}s)")
+
+    ok = True
+    if elapsed > IMPORT_TIME_BUDGET_SECONDS:
+        logger.error("Import time budget exceeded.")
+        ok = False
+    if loaded:
+        logger.error(f"Heavy modules imported at startup: {loaded}")
+        ok = False
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if check_import_time() else 1)
@@ -0,0 +1,56 @@
+import argparse
+import os
+import logging
+import sys
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+if os.getenv("DOCKER_ENV") != "true":
+    os.environ['POSTGRES_HOST'] = 'localhost'
+
+from sqlalchemy import func
+from Database.connection import get_session, init_engine
+from Database.models import Transcript
+from Database.compression import current_dictionary_id, train_compression_dictionary, recompress_transcripts
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def log_storage(db):
+    plain, compressed = db.query(func.sum(func.length(Transcript.transcript_text)), func.sum(func.length(Transcript.transcript_compressed))).one()
+    logger.info(f"Transcript storage: {plain or 0} bytes plain text, {compressed or 0} bytes compressed")
+
+def compress_transcripts(retrain: bool, decompress: bool, sample_size: int):
+    logger.info("--- Starting Transcript Compression Script ---")
+    init_engine()
+    db = get_session()
+    if not db:
+        logger.critical("DB session is None. Exiting.")
+        return
+
+    try:
+        log_storage(db)
+        if decompress:
+            dict_id = None
+        else:
+            dict_id = None if retrain else current_dictionary_id(db)
+            if dict_id is None:
+                dict_id = train_compression_dictionary(db, sample_size=sample_size)
+                if dict_id is None:
+                    logger.critical("Could not train a compression dictionary. Exiting.")
+                    return
+            logger.info(f"Compressing transcripts with dictionary version {dict_id}...")
+
+        rewritten = recompress_transcripts(db, dict_id)
+        logger.info(f"Rewrote {rewritten} transcripts.")
+        log_storage(db)
+    finally:
+        db.close()
+        logger.info("--- Transcript Compression Script Finished ---")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress stored transcripts with a shared zstd dictionary.")
+    parser.add_argument("--retrain", action="store_true", help="train a new dictionary version and recompress every transcript with it")
+    parser.add_argument("--decompress", action="store_true", help="restore every transcript to plain text")
+    parser.add_argument("--sample-size", type=int, default=2000, help="number of transcripts to train the dictionary on")
+    args = parser.parse_args()
+    compress_transcripts(args.retrain, args.decompress, args.sample_size)
@@ -0,0 +1,31 @@
+import os
+import logging
+import sys
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+if os.getenv("DOCKER_ENV") != "true":
+    os.environ['POSTGRES_HOST'] = 'localhost'
+
+from Database.connection import get_session, init_engine
+from Database.module import backfill_duplicate_index
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def detect_duplicates():
+    logger.info("--- Starting Duplicate Detection Script ---")
+    init_engine()
+    db = get_session()
+    if not db:
+        logger.critical("DB session is None. Exiting.")
+        return
+
+    try:
+        indexed = backfill_duplicate_index(db)
+        logger.info(f"Indexed {indexed} transcripts for near-duplicate detection.")
+    finally:
+        db.close()
+        logger.info("--- Duplicate Detection Script Finished ---")
+
+if __name__ == "__main__":
+    detect_duplicates()
@@ -0,0 +1,36 @@
+import os
+import logging
+import sys
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+if os.getenv("DOCKER_ENV") != "true":
+    os.environ['POSTGRES_HOST'] = 'localhost'
+
+from Database.connection import get_session, init_engine
+from Database.module import evaluate_embedding_index
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+RECALL_K = int(os.getenv("RECALL_K", "5"))
+
+def evaluate():
+    logger.info("--- Starting Embedding Index Evaluation ---")
+    init_engine()
+    db = get_session()
+    if not db:
+        logger.critical("DB session is None. Exiting.")
+        return
+
+    try:
+        report = evaluate_embedding_index(db, k=RECALL_K)
+        if not report:
+            logger.info("No embeddings found. Run process_data.py first.")
+        for mode, stats in report.items():
+            logger.info(f"{mode:>5}: {stats['bytes_per_call']:>7.1f} bytes/call, recall@{RECALL_K} = {stats['recall_at_k']:.3f}")
+    finally:
+        db.close()
+        logger.info("--- Embedding Index Evaluation Finished ---")
+
+if __name__ == "__main__":
+    evaluate()
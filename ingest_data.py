@@ -21,7 +21,7 @@ if os.getenv("DOCKER_ENV") != "true":
     os.environ['POSTGRES_HOST'] = 'localhost'
 
 try:
-    from connection import SessionLocal  
+    from connection import get_session, init_engine
     from schemas import CallCreate        
     from module import get_or_create_agent, create_call_with_transcript
 except ImportError as e:
@@ -56,7 +56,8 @@ def main():
     RAW_DATA_DIR = "database" 
     os.makedirs(RAW_DATA_DIR, exist_ok=True)
     
-    db = SessionLocal()
+    init_engine()
+    db = get_session()
     if not db:
         logger.critical("Failed to create a database session. Exiting.")
         return
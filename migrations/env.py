@@ -23,12 +23,13 @@ if project_root not in sys.path:
 # This will now use the correct POSTGRES_HOST value
 try:
     from Database.models import Base
-    from Database.connection import engine
-    logging.info("-> Successfully imported 'Base' and 'engine'.")
+    from Database.connection import init_engine
+    logging.info("-> Successfully imported 'Base' and 'init_engine'.")
 except ImportError as e:
     logging.info(f"\n-> !!! IMPORT FAILED !!! Error: {e}")
     sys.exit(1)
 
+engine = init_engine()
 if engine is None:
     logging.info("\n-> CRITICAL: Database engine is None. Migration cannot proceed.")
     logging.info("   -> Check your .env file and connection.py for errors.")
@@ -0,0 +1,43 @@
+"""Add call_neighbors table for precomputed similar calls
+
+Revision ID: 7c2d9e41a0b3
+Revises: f3a186e5b602
+Create Date: 2026-10-19 10:12:03.418226
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2d9e41a0b3'
+down_revision: Union[str, Sequence[str], None] = 'f3a186e5b602'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('call_neighbors',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('call_id_fk', sa.Integer(), nullable=False),
+    sa.Column('neighbor_call_id_fk', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('similarity_score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['call_id_fk'], ['calls.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['neighbor_call_id_fk'], ['calls.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_call_neighbors_id'), 'call_neighbors', ['id'], unique=False)
+    op.create_index(op.f('ix_call_neighbors_call_id_fk'), 'call_neighbors', ['call_id_fk'], unique=False)
+    op.create_index('ix_call_neighbors_call_rank', 'call_neighbors', ['call_id_fk', 'rank'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_call_neighbors_call_rank', table_name='call_neighbors')
+    op.drop_index(op.f('ix_call_neighbors_call_id_fk'), table_name='call_neighbors')
+    op.drop_index(op.f('ix_call_neighbors_id'), table_name='call_neighbors')
+    op.drop_table('call_neighbors')
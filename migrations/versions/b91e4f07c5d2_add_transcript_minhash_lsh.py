@@ -0,0 +1,49 @@
+"""Add MinHash signature, duplicate link and LSH band table for transcripts
+
+Revision ID: b91e4f07c5d2
+Revises: 7c2d9e41a0b3
+Create Date: 2026-10-19 11:40:51.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b91e4f07c5d2'
+down_revision: Union[str, Sequence[str], None] = '7c2d9e41a0b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('transcripts', sa.Column('minhash_signature', sa.Text(), nullable=True))
+    op.add_column('transcripts', sa.Column('duplicate_of_call_id_fk', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_transcripts_duplicate_of_call_id_fk', 'transcripts', 'calls', ['duplicate_of_call_id_fk'], ['id'])
+    op.create_index(op.f('ix_transcripts_duplicate_of_call_id_fk'), 'transcripts', ['duplicate_of_call_id_fk'], unique=False)
+    op.create_table('transcript_lsh_bands',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('transcript_id_fk', sa.Integer(), nullable=False),
+    sa.Column('band_index', sa.Integer(), nullable=False),
+    sa.Column('band_hash', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['transcript_id_fk'], ['transcripts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_transcript_lsh_bands_id'), 'transcript_lsh_bands', ['id'], unique=False)
+    op.create_index(op.f('ix_transcript_lsh_bands_transcript_id_fk'), 'transcript_lsh_bands', ['transcript_id_fk'], unique=False)
+    op.create_index('ix_transcript_lsh_bands_band', 'transcript_lsh_bands', ['band_index', 'band_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transcript_lsh_bands_band', table_name='transcript_lsh_bands')
+    op.drop_index(op.f('ix_transcript_lsh_bands_transcript_id_fk'), table_name='transcript_lsh_bands')
+    op.drop_index(op.f('ix_transcript_lsh_bands_id'), table_name='transcript_lsh_bands')
+    op.drop_table('transcript_lsh_bands')
+    op.drop_index(op.f('ix_transcripts_duplicate_of_call_id_fk'), table_name='transcripts')
+    op.drop_constraint('fk_transcripts_duplicate_of_call_id_fk', 'transcripts', type_='foreignkey')
+    op.drop_column('transcripts', 'duplicate_of_call_id_fk')
+    op.drop_column('transcripts', 'minhash_signature')
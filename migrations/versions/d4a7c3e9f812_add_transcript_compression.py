@@ -0,0 +1,56 @@
+"""Add zstd dictionary table and compressed transcript column
+
+Revision ID: d4a7c3e9f812
+Revises: b91e4f07c5d2
+Create Date: 2026-10-19 12:05:37.220871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7c3e9f812'
+down_revision: Union[str, Sequence[str], None] = 'b91e4f07c5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('compression_dictionaries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('dict_data', sa.LargeBinary(), nullable=False),
+    sa.Column('sample_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_compression_dictionaries_id'), 'compression_dictionaries', ['id'], unique=False)
+    op.add_column('transcripts', sa.Column('transcript_compressed', sa.LargeBinary(), nullable=True))
+    op.add_column('transcripts', sa.Column('compression_dict_id_fk', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_transcripts_compression_dict_id_fk', 'transcripts', 'compression_dictionaries', ['compression_dict_id_fk'], ['id'])
+    op.create_index(op.f('ix_transcripts_compression_dict_id_fk'), 'transcripts', ['compression_dict_id_fk'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema.
+
+    Refuses to run while any transcript is still stored compressed, since dropping
+    the column would lose it; `python compress_transcripts.py --decompress` restores them.
+    """
+    compressed = op.get_bind().execute(
+        sa.text('SELECT count(*) FROM transcripts WHERE transcript_compressed IS NOT NULL')
+    ).scalar()
+    if compressed:
+        raise RuntimeError(
+            f"{compressed} transcripts are stored compressed and would be lost. "
+            "Run `python compress_transcripts.py --decompress` before downgrading."
+        )
+    op.drop_index(op.f('ix_transcripts_compression_dict_id_fk'), table_name='transcripts')
+    op.drop_constraint('fk_transcripts_compression_dict_id_fk', 'transcripts', type_='foreignkey')
+    op.drop_column('transcripts', 'compression_dict_id_fk')
+    op.drop_column('transcripts', 'transcript_compressed')
+    op.drop_index(op.f('ix_compression_dictionaries_id'), table_name='compression_dictionaries')
+    op.drop_table('compression_dictionaries')
@@ -0,0 +1,33 @@
+import os
+import logging
+import sys
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+if os.getenv("DOCKER_ENV") != "true":
+    os.environ['POSTGRES_HOST'] = 'localhost'
+
+from Database.connection import get_session, init_engine
+from Database.module import precompute_call_neighbors
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+NEIGHBORS_PER_CALL = int(os.getenv("NEIGHBORS_PER_CALL", "20"))
+
+def precompute_neighbors():
+    logger.info("--- Starting Neighbor Precomputation Script ---")
+    init_engine()
+    db = get_session()
+    if not db:
+        logger.critical("DB session is None. Exiting.")
+        return
+
+    try:
+        stored = precompute_call_neighbors(db, limit=NEIGHBORS_PER_CALL)
+        logger.info(f"Precomputed {NEIGHBORS_PER_CALL} neighbors for {stored} calls.")
+    finally:
+        db.close()
+        logger.info("--- Neighbor Precomputation Script Finished ---")
+
+if __name__ == "__main__":
+    precompute_neighbors()
@@ -7,8 +7,9 @@ sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 if os.getenv("DOCKER_ENV") != "true":
     os.environ['POSTGRES_HOST'] = 'localhost'
 
-from Database.connection import SessionLocal
+from Database.connection import get_session, init_engine
 from Database.models import Transcript
+from Database.compression import get_transcript_text
 from Ai_Services.ai_services import analyze_sentiment, generate_embedding, calculate_talk_ratio
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,7 +17,8 @@ logger = logging.getLogger(__name__)
 
 def process_data():
     logger.info("--- Starting AI Data Processing Script ---")
-    db = SessionLocal()
+    init_engine()
+    db = get_session()
     if not db:
         logger.critical("DB session is None. Exiting.")
         return
@@ -31,7 +33,7 @@ def process_data():
         logger.info(f"Found {total} transcripts to process...")
 
         for i, ts_obj in enumerate(transcripts_to_process):
-            text = ts_obj.transcript_text
+            text = get_transcript_text(ts_obj, db)
             if not text:
                 logger.warning(f"Skipping transcript ID {ts_obj.id} due to empty text.")
                 continue